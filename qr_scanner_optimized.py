@@ -13,6 +13,10 @@ import time
 import warnings
 import logging
 import os
+import sys
+import select
+import hashlib
+from collections import namedtuple, deque, OrderedDict
 from datetime import datetime
 from pyzbar import pyzbar
 import threading
@@ -23,6 +27,37 @@ import numpy as np
 logging.getLogger().setLevel(logging.ERROR)
 warnings.filterwarnings("ignore", category=RuntimeWarning, module="pyzbar")
 
+# 与pyzbar一致的矩形格式
+Rect = namedtuple('Rect', ['left', 'top', 'width', 'height'])
+
+# 单个二维码的检测结果：内容、外接矩形、角点（int32数组）、检测方法
+Detection = namedtuple('Detection', ['data', 'rect', 'polygon', 'method'])
+
+# 可选的摄像头采集后端
+CAPTURE_BACKENDS = {
+    'any': cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+}
+
+def get_capture_backend(name='auto'):
+    """
+    根据名称获取摄像头采集后端
+    auto时使用平台原生后端，避免OpenCV依次尝试其他后端（如FFMPEG）导致打开摄像头很慢
+    """
+    name = str(name).lower()
+    if name == 'auto':
+        if sys.platform.startswith('linux'):
+            return cv2.CAP_V4L2
+        if sys.platform == 'win32':
+            return cv2.CAP_DSHOW
+        if sys.platform == 'darwin':
+            return cv2.CAP_AVFOUNDATION
+        return cv2.CAP_ANY
+    return CAPTURE_BACKENDS.get(name, cv2.CAP_ANY)
+
 class ConfigManager:
     """配置管理器"""
     
@@ -33,13 +68,20 @@ class ConfigManager:
         "udp_port": 8888,
         "send_interval": 1.0,
         "target_fps": 30,
+        "camera_fourcc": "MJPG",  # 摄像头像素格式：MJPG / YUYV / auto（不设置，使用驱动默认）
+        "camera_backend": "auto",  # 采集后端：auto（平台原生）/ any / v4l2 / dshow / msmf / avfoundation
         "debug_mode": False,
         "show_ui": True,  # 是否显示界面
+        "use_opengl_window": False,  # 使用OpenGL窗口显示（由驱动上传纹理，OpenCV未编译OpenGL支持时自动回退普通窗口）
         "custom_resolutions": {},
         "camera_preferences": {},
         "available_cameras": [],
+        "available_cameras_time": 0,  # 上次检测摄像头的时间戳
+        "camera_scan_max_age": 86400,  # 摄像头列表缓存有效期（秒），过期后启动时重新检测
         "performance": {
             "adaptive_skip_interval": 2,
+            "idle_miss_threshold": 15,  # 连续多少次检测未发现二维码后降低检测频率
+            "idle_skip_max": 2,  # 空闲时最多额外跳过的帧数（0表示不降频）
             "detection_region_scale": 0.4,
             "detection_region_custom": {  # 自定义检测区域
                 "enabled": False,
@@ -50,15 +92,25 @@ class ConfigManager:
             },
             "use_simple_preprocess": True,
             "use_opencv_qr": True,
+            "use_aruco_qr_detector": True,  # 使用QRCodeDetectorAruco（OpenCV 4.8+，噪声画面下更快）
+            "use_pyzbar_fallback": True,  # OpenCV未检测到时使用pyzbar备用检测
+            "async_pyzbar": True,  # pyzbar备用检测放到后台线程
+            "use_opencl": False,  # 灰度转换和缩放使用OpenCL（需要可用的GPU驱动）
+            "opencv_threads": 0,  # OpenCV内部线程数，0为CPU核数的一半（其余留给采集和pyzbar线程）
+            "edge_gate_min_pixels": 24,  # 1/4分辨率下边缘像素少于该值时认为画面中没有二维码（与区域大小无关），0为关闭
             "dynamic_resolution": True,
-            "detection_scales": [1.0, 0.7, 0.5],
+            "detection_scales": [0.5, 0.7, 1.0],  # 先在小尺度上检测，未命中再用原尺寸
             "min_confidence": 2,
-            "cache_ttl": 5
+            "cache_ttl": 5,
+            "cache_diff_threshold": 3.0,
+            "cache_max_size": 64
         }
     }
     
     def __init__(self, config_file="camera_config.json"):
         self.config_file = config_file
+        self._saved_digest = None  # 上次写入文件的配置摘要，内容未变化时跳过写盘
+        self.cameras_from_cache = False  # 摄像头列表是否来自配置文件（未重新检测）
         self.config = self.load_config()
         
     def load_config(self):
@@ -66,11 +118,14 @@ class ConfigManager:
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    loaded_config = json.load(f)
+                    text = f.read()
+                loaded_config = json.loads(text)
                 
                 # 合并默认配置和加载的配置
                 config = self.DEFAULT_CONFIG.copy()
                 self._merge_dict(config, loaded_config)
+                # 按save_config的序列化方式记录摘要，文件格式不同但内容未变时不会重写
+                self._saved_digest = self._digest(json.dumps(config, indent=2, ensure_ascii=False))
                 
                 print(f"✓ 已加载配置文件: {self.config_file}")
                 return config
@@ -91,11 +146,21 @@ class ConfigManager:
             else:
                 base_dict[key] = value
     
+    @staticmethod
+    def _digest(text):
+        """配置文本的摘要，用于判断内容是否变化"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    
     def save_config(self):
-        """保存配置文件"""
+        """保存配置文件（与上次保存的内容相同时不重复写盘）"""
         try:
+            text = json.dumps(self.config, indent=2, ensure_ascii=False)
+            digest = self._digest(text)
+            if digest == self._saved_digest:
+                return
             with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+                f.write(text)
+            self._saved_digest = digest
             print(f"✓ 配置已保存到: {self.config_file}")
         except Exception as e:
             print(f"⚠️  保存配置失败: {e}")
@@ -121,14 +186,39 @@ class ConfigManager:
             config = config[k]
         config[keys[-1]] = value
     
+    def get_available_cameras(self, force_rescan=False):
+        """
+        获取可用摄像头列表
+        配置文件中的列表未过期时直接使用，避免每次启动都逐个打开摄像头
+        cameras_from_cache记录本次是否使用了保存的列表（列表可能已过时）
+        """
+        cameras = self.config.get('available_cameras', [])
+        age = time.time() - self.config.get('available_cameras_time', 0)
+        if not force_rescan and cameras and 0 <= age < self.config.get('camera_scan_max_age', 86400):
+            print(f"📷 使用已保存的摄像头列表: {len(cameras)} 个（按 'x' 键或使用 --rescan-cameras 重新检测）")
+            self.cameras_from_cache = True
+            return cameras
+        
+        self.cameras_from_cache = False
+        cameras = self.detect_available_cameras()
+        self.save_config()
+        return cameras
+    
     def detect_available_cameras(self):
         """检测可用的摄像头"""
         available_cameras = []
+        misses = 0
+        backend_id = get_capture_backend(self.get('camera_backend', 'auto'))
         print("🔍 正在检测可用摄像头...")
         
         for i in range(10):  # 检测前10个摄像头索引
-            cap = cv2.VideoCapture(i)
+            # 摄像头索引基本连续，连续两个索引打不开时停止检测
+            if misses >= 2:
+                break
+            
+            cap = cv2.VideoCapture(i, backend_id)
             if cap.isOpened():
+                misses = 0
                 # 获取摄像头信息
                 width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
                 height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -147,6 +237,7 @@ class ConfigManager:
                 print(f"  ✓ 摄像头 {i}: {width}x{height} @ {fps:.1f}fps ({backend})")
                 cap.release()
             else:
+                misses += 1
                 cap.release()
         
         if not available_cameras:
@@ -155,6 +246,7 @@ class ConfigManager:
             print(f"  📷 共检测到 {len(available_cameras)} 个摄像头")
         
         self.config["available_cameras"] = available_cameras
+        self.config["available_cameras_time"] = time.time()
         return available_cameras
 
 class OptimizedQRCodeScanner:
@@ -167,6 +259,11 @@ class OptimizedQRCodeScanner:
         'ultra_hd': (3840, 2160)
     }
     
+    # UDP包格式：{"timestamp": ..., "qr_content": ..., "source": ...}
+    UDP_PACKET_TEMPLATE = '{"timestamp": "%s", "qr_content": %s, "source": "optimized_qr_scanner_v2"}'
+    
+    WINDOW_NAME = 'Optimized QR Scanner V2'
+    
     def __init__(self, udp_host=None, udp_port=None, resolution=None, 
                  camera_index=None, debug_mode=None, target_fps=None, config_file="camera_config.json"):
         """
@@ -182,6 +279,8 @@ class OptimizedQRCodeScanner:
         self.debug_mode = debug_mode if debug_mode is not None else self.config_manager.get('debug_mode')
         self.target_fps = target_fps or self.config_manager.get('target_fps')
         self.show_ui = self.config_manager.get('show_ui', True)  # 是否显示界面
+        self.use_opengl_window = self.config_manager.get('use_opengl_window', False)  # 使用OpenGL窗口
+        self._window_created = False
         
         # 翻页检测相关参数
         self.page_turning_mode = self.config_manager.get('page_turning_mode', False)  # 翻页检测模式
@@ -201,6 +300,11 @@ class OptimizedQRCodeScanner:
         
         # 初始化socket
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_address = self.resolve_udp_address()
+        
+        # UDP发送线程，避免socket发送阻塞检测
+        self._send_q = queue.Queue(maxsize=64)
+        self._sender_thread = None
         self.last_qr_data = None
         self.last_send_time = 0
         self.send_interval = self.config_manager.get('send_interval')
@@ -209,6 +313,12 @@ class OptimizedQRCodeScanner:
         perf_config = self.config_manager.get('performance', {})
         self.frame_skip_count = 0
         self.adaptive_skip_interval = perf_config.get('adaptive_skip_interval', 2)
+        
+        # 空闲降频：长时间没有二维码时额外跳帧，一旦识别到立即恢复
+        self.idle_miss_threshold = max(1, perf_config.get('idle_miss_threshold', 15))
+        self.idle_skip_max = perf_config.get('idle_skip_max', 2)
+        self._miss_streak = 0
+        self._idle_skip = 0
         self.detection_region_scale = perf_config.get('detection_region_scale', 0.4)
         
         # 自定义检测区域
@@ -221,6 +331,18 @@ class OptimizedQRCodeScanner:
         
         self.use_simple_preprocess = perf_config.get('use_simple_preprocess', True)
         self.use_opencv_qr = perf_config.get('use_opencv_qr', True)
+        self.use_aruco_qr_detector = perf_config.get('use_aruco_qr_detector', True)
+        self.use_pyzbar_fallback = perf_config.get('use_pyzbar_fallback', True)
+        self.async_pyzbar = perf_config.get('async_pyzbar', True)
+        self.use_opencl_config = perf_config.get('use_opencl', False)  # 保存到配置文件的用户设置
+        self.use_opencl = self.use_opencl_config and cv2.ocl.haveOpenCL()  # 实际是否启用
+        self.edge_gate_min_pixels = perf_config.get('edge_gate_min_pixels', 24)
+        
+        # 固定OpenCV线程池大小，避免与采集、pyzbar线程争抢CPU
+        self.opencv_threads = perf_config.get('opencv_threads', 0)
+        cv2.setNumThreads(self.opencv_threads if self.opencv_threads > 0
+                          else max(1, (os.cpu_count() or 2) // 2))
+        cv2.ocl.setUseOpenCL(self.use_opencl)
         self.dynamic_resolution = perf_config.get('dynamic_resolution', True)
         
         # 摄像头控制参数（仅显示，macOS AVFOUNDATION后端不支持软件控制）
@@ -229,13 +351,18 @@ class OptimizedQRCodeScanner:
         self.show_camera_warning = True
         
         # 性能监控
-        self.fps_history = []
-        self.performance_check_interval = 60
+        self.performance_check_interval = 60  # 累计多少个FPS样本后进行一次调整
+        self.fps_window = 30  # 计算平均FPS的样本数
+        self.fps_history = deque(maxlen=self.fps_window)
+        self._fps_sum = 0.0  # fps_history中样本的累计和
+        self._fps_sample_count = 0  # 距上次调整累计的样本数
         self.target_min_fps = 15
         
         # 多尺度检测
-        self.detection_scales = perf_config.get('detection_scales', [1.0, 0.7, 0.5])
-        self.current_scale_index = 0
+        self.detection_scales = perf_config.get('detection_scales', [0.5, 0.7, 1.0])
+        self.current_scale_index = 0  # 上次识别成功的尺度，优先尝试
+        self.full_scale_scan_interval = 30  # 每隔多少次检测按原顺序完整扫描一次
+        self.detection_attempts = 0
         
         # 识别稳定性跟踪
         self.qr_confidence = {}
@@ -247,11 +374,58 @@ class OptimizedQRCodeScanner:
         self.url_pattern = re.compile(r'https?://[^\s]+')
         
         # OpenCV QR检测器初始化
-        self.cv_qr_detector = cv2.QRCodeDetector()
+        # 优先使用基于ArUco的检测器（OpenCV 4.8+），不可用时回退到经典检测器
+        if self.use_aruco_qr_detector and hasattr(cv2, 'QRCodeDetectorAruco'):
+            self.cv_qr_detector = cv2.QRCodeDetectorAruco()
+        else:
+            self.cv_qr_detector = cv2.QRCodeDetector()
+
+        # 上次pyzbar识别成功的预处理结果索引
+        self.last_pyzbar_method = 0
+        
+        # zbar的C层警告输出在run()开始时才屏蔽，打开摄像头期间保留OpenCV的错误信息
+        self._saved_stderr_fd = None
+
+        # 采集线程：只保留最新一帧，处理慢时自动丢弃旧帧
+        self._frame_q = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._capture_thread = None
+        
+        # 帧缓冲区池：显示完或被丢弃的帧放回池中，采集线程直接写入，避免每帧分配新的大数组
+        self._free_frames = queue.Queue()
+
+        # pyzbar解码线程：OpenCV未命中的区域交给后台解码，结果在之后的帧中取回
+        self._decode_q = queue.Queue(maxsize=2)
+        self._result_q = queue.Queue()
+        self._decode_stop = threading.Event()
+        self._decode_thread = None
+
+        # 检测线程：取帧、检测、发送UDP并绘制标注，主线程只负责显示和按键
+        self._draw_q = queue.Queue(maxsize=2)
+        self._detect_stop = threading.Event()
+        self._detect_thread = None
+        # 按键触发的状态修改，由检测线程在处理下一帧前执行，避免与检测并发修改
+        self._pending_actions = queue.SimpleQueue()
+        
+        # 检测线程复用的图像缓冲区（灰度图、各尺度缩放结果）
+        self._buffers = {}
+        
+        # 检测区域位置缓存（帧尺寸或区域参数变化时重新计算）
+        self._roi_key = None
+        self._roi_rect = None
+        self._roi_label = None  # 调试模式下绘制的区域标签和颜色，随区域一起缓存
         
         # 缓存最近的检测结果
-        self.detection_cache = {}
+        # 按最近使用顺序排列的LRU缓存，超过上限时淘汰最久未使用的条目
+        self.detection_cache = OrderedDict()
         self.cache_ttl = perf_config.get('cache_ttl', 5)
+        self.cache_max_size = perf_config.get('cache_max_size', 64)
+        
+        # 模糊缓存：检测区域缩略图与上次检测时的平均差异低于阈值时，直接复用上次结果
+        self.cache_diff_threshold = perf_config.get('cache_diff_threshold', 3.0)
+        self._last_thumb = None
+        self._last_thumb_frame = 0
+        self._last_thumb_result = None
         
         # 解析分辨率设置
         custom_resolutions = self.config_manager.get('custom_resolutions', {})
@@ -270,21 +444,19 @@ class OptimizedQRCodeScanner:
             self.width, self.height = self.RESOLUTIONS['ultra_hd']
         
         # 检测可用摄像头
-        available_cameras = self.config_manager.detect_available_cameras()
-        
-        # 验证摄像头索引
-        if available_cameras:
-            available_indices = [cam['index'] for cam in available_cameras]
-            if camera_index not in available_indices:
-                print(f"⚠️  指定的摄像头索引 {camera_index} 不可用")
-                print(f"可用摄像头: {available_indices}")
-                camera_index = available_indices[0]
-                print(f"使用摄像头: {camera_index}")
-                # 更新配置文件
-                self.config_manager.set('default_camera_index', camera_index)
+        available_cameras = self.config_manager.get_available_cameras()
+        requested_index = camera_index
+        camera_index = self.choose_camera_index(requested_index, available_cameras)
         
         # 初始化摄像头
-        self.cap = cv2.VideoCapture(camera_index)
+        self.cap = self.open_camera(camera_index)
+        if not self.cap.isOpened() and self.config_manager.cameras_from_cache:
+            # 保存的列表可能已过时（摄像头拔出或编号变化），重新检测一次再决定
+            print(f"⚠️  无法打开摄像头 {camera_index}，保存的摄像头列表可能已过时")
+            self.cap.release()
+            available_cameras = self.config_manager.get_available_cameras(force_rescan=True)
+            camera_index = self.choose_camera_index(requested_index, available_cameras)
+            self.cap = self.open_camera(camera_index)
         if not self.cap.isOpened():
             raise RuntimeError(f"无法打开摄像头 {camera_index}")
         
@@ -309,6 +481,9 @@ class OptimizedQRCodeScanner:
         }
         self.config_manager.set(f'camera_preferences.camera_{camera_index}', camera_info)
         
+        # 按键与对应操作
+        self.key_actions = self.build_key_actions()
+        
         print(f"优化版二维码扫描器已初始化")
         print(f"UDP目标: {self.udp_host}:{self.udp_port}")
         print(f"使用摄像头: {camera_index}")
@@ -318,8 +493,13 @@ class OptimizedQRCodeScanner:
         print(f"配置文件: {self.config_manager.config_file}")
         print(f"高级性能优化:")
         print(f"  - 自适应跳帧: 初始每{self.adaptive_skip_interval + 1}帧检测一次")
+        print(f"  - 空闲降频: 连续{self.idle_miss_threshold}次未识别后最多额外跳过{self.idle_skip_max}帧")
         print(f"  - 检测区域: 中心{self.detection_region_scale*100:.0f}%区域")
-        print(f"  - OpenCV QR检测: {'开启' if self.use_opencv_qr else '关闭'}")
+        print(f"  - OpenCV QR检测: {'开启' if self.use_opencv_qr else '关闭'} ({type(self.cv_qr_detector).__name__})")
+        print(f"  - pyzbar备用检测: {'开启' if self.use_pyzbar_fallback else '关闭'}")
+        print(f"  - 后台pyzbar解码: {'开启' if self.async_pyzbar else '关闭'}")
+        print(f"  - OpenCL加速: {'开启' if self.use_opencl else '关闭'}")
+        print(f"  - OpenCV线程数: {cv2.getNumThreads()}")
         print(f"  - 动态优化: {'开启' if self.dynamic_resolution else '关闭'}")
         print(f"  - 多尺度检测: {len(self.detection_scales)}个尺度")
         print(f"  - 结果缓存: {self.cache_ttl}帧TTL")
@@ -332,6 +512,41 @@ class OptimizedQRCodeScanner:
         
         print(f"按 'q' 键退出程序")
     
+    def suppress_native_stderr(self):
+        """
+        将进程的stderr文件描述符重定向到空设备，屏蔽zbar等C库直接写出的警告
+        （redirect_stderr只能替换Python层的sys.stderr，拦不住C库的输出）
+        Python层的sys.stderr仍指向原来的终端
+        """
+        if self._saved_stderr_fd is not None:
+            return
+        
+        try:
+            if sys.stderr is not None:
+                sys.stderr.flush()
+            saved_fd = os.dup(2)
+            devnull_fd = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull_fd, 2)
+            os.close(devnull_fd)
+        except OSError as e:
+            print(f"⚠️  无法屏蔽zbar警告输出: {e}")
+            return
+        
+        self._saved_stderr_fd = saved_fd
+        sys.stderr = os.fdopen(saved_fd, 'w', buffering=1, closefd=False)
+    
+    def restore_native_stderr(self):
+        """恢复进程的stderr文件描述符"""
+        if self._saved_stderr_fd is None:
+            return
+        
+        if sys.stderr is not None:
+            sys.stderr.flush()
+        sys.stderr = sys.__stderr__
+        os.dup2(self._saved_stderr_fd, 2)
+        os.close(self._saved_stderr_fd)
+        self._saved_stderr_fd = None
+    
     def detect_camera_capabilities(self):
         """
         检测摄像头能力
@@ -352,8 +567,45 @@ class OptimizedQRCodeScanner:
             self.supports_manual_control = abs(new_focus - (original_focus + 1)) < 0.1
             self.cap.set(cv2.CAP_PROP_FOCUS, original_focus)  # 恢复原值
     
+    def choose_camera_index(self, camera_index, available_cameras):
+        """
+        验证摄像头索引，不在可用列表中时改用第一个可用摄像头
+        """
+        if available_cameras:
+            available_indices = [cam['index'] for cam in available_cameras]
+            if camera_index not in available_indices:
+                print(f"⚠️  指定的摄像头索引 {camera_index} 不可用")
+                print(f"可用摄像头: {available_indices}")
+                camera_index = available_indices[0]
+                print(f"使用摄像头: {camera_index}")
+                # 更新配置文件
+                self.config_manager.set('default_camera_index', camera_index)
+        return camera_index
+    
+    def open_camera(self, camera_index):
+        """
+        打开摄像头（使用配置的采集后端），并立即把驱动端缓冲区设为1帧
+        避免处理较慢时读到驱动队列里积压的旧帧
+        """
+        backend = get_capture_backend(self.config_manager.get('camera_backend', 'auto'))
+        cap = cv2.VideoCapture(camera_index, backend)
+        if not cap.isOpened() and backend != cv2.CAP_ANY:
+            # 指定的后端打不开时，交给OpenCV自动选择
+            cap = cv2.VideoCapture(camera_index)
+        if cap.isOpened() and not cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+            if self.debug_mode:
+                print(f"⚠️  摄像头 {camera_index} 不支持设置缓冲区大小")
+        return cap
+    
     def optimize_camera_settings(self):
         """优化摄像头设置"""
+        # 像素格式必须在分辨率之前设置（V4L2下先设分辨率会按默认的YUYV协商）
+        # MJPG由libjpeg-turbo解码，高分辨率下比YUYV转BGR快得多
+        fourcc = str(self.config_manager.get('camera_fourcc', 'MJPG')).upper()
+        if fourcc != 'AUTO' and len(fourcc) == 4:
+            if not self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc)):
+                print(f"   ⚠️ 摄像头不支持 {fourcc} 格式")
+        
         # 基本设置
         self.cap.set(cv2.CAP_PROP_FPS, self.target_fps)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
@@ -363,9 +615,6 @@ class OptimizedQRCodeScanner:
         if self.supports_manual_control:
             print("🔧 应用摄像头手动设置...")
             try:
-                # 编码格式设置
-                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-                
                 # 其他可能的优化设置
                 self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 0.25)  # 手动曝光
                 self.cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)  # 禁用自动对焦
@@ -376,15 +625,16 @@ class OptimizedQRCodeScanner:
                 print(f"   ⚠️ 部分设置可能不被支持: {e}")
         else:
             print("🔧 应用基本优化设置...")
-            try:
-                # 只设置基本参数
-                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
-                print("   ✓ 基本设置已应用")
-            except Exception as e:
-                print(f"   ⚠️ 设置可能不被支持: {e}")
+            print("   ✓ 基本设置已应用")
         
         # 等待设置生效
         time.sleep(0.3)
+        
+        # 确认实际生效的像素格式
+        actual_fourcc = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        if actual_fourcc > 0:
+            fourcc_str = ''.join(chr((actual_fourcc >> (8 * i)) & 0xFF) for i in range(4))
+            print(f"   像素格式: {fourcc_str}")
     
     def show_camera_info(self):
         """
@@ -417,42 +667,62 @@ class OptimizedQRCodeScanner:
         print(f"  - 缓存大小: {len(self.detection_cache)}项")
         print()
     
+    def record_fps(self, fps):
+        """
+        记录一个FPS样本，同步维护窗口内的累计和
+        """
+        if len(self.fps_history) == self.fps_window:
+            self._fps_sum -= self.fps_history[0]
+        self.fps_history.append(fps)
+        self._fps_sum += fps
+        self._fps_sample_count += 1
+    
     def adaptive_performance_adjust(self, current_fps):
         """
         自适应性能调整
+        帧率统计在主线程中进行，跳帧间隔和检测区域的修改交给检测线程执行
         """
-        if len(self.fps_history) >= self.performance_check_interval:
-            avg_fps = sum(self.fps_history[-30:]) / min(30, len(self.fps_history))
+        if self._fps_sample_count >= self.performance_check_interval:
+            avg_fps = self._fps_sum / len(self.fps_history)
+            self._pending_actions.put(lambda: self.apply_performance_adjust(avg_fps))
             
-            if avg_fps < self.target_min_fps:
-                # 性能不足，增加优化
-                if self.adaptive_skip_interval < 4:
-                    self.adaptive_skip_interval += 1
-                    print(f"📉 性能优化: 跳帧间隔调整为 {self.adaptive_skip_interval}")
-                
-                if self.detection_region_scale > 0.3:
-                    self.detection_region_scale = max(0.3, self.detection_region_scale - 0.1)
-                    print(f"📉 性能优化: 检测区域调整为 {self.detection_region_scale*100:.0f}%")
-                
-            elif avg_fps > self.target_min_fps * 1.5:
-                # 性能充足，可以提升质量
-                if self.adaptive_skip_interval > 1:
-                    self.adaptive_skip_interval -= 1
-                    print(f"📈 质量提升: 跳帧间隔调整为 {self.adaptive_skip_interval}")
-                
-                if self.detection_region_scale < 0.8:
-                    self.detection_region_scale = min(0.8, self.detection_region_scale + 0.1)
-                    print(f"📈 质量提升: 检测区域调整为 {self.detection_region_scale*100:.0f}%")
+            # 保留最近的样本，再累计一个窗口的新样本后进行下次调整
+            self._fps_sample_count = self.performance_check_interval - self.fps_window
+    
+    def apply_performance_adjust(self, avg_fps):
+        """
+        根据平均帧率调整跳帧间隔和检测区域（在检测线程中执行）
+        """
+        if avg_fps < self.target_min_fps:
+            # 性能不足，增加优化
+            if self.adaptive_skip_interval < 4:
+                self.adaptive_skip_interval += 1
+                print(f"📉 性能优化: 跳帧间隔调整为 {self.adaptive_skip_interval}")
             
-            # 清理历史记录
-            self.fps_history = self.fps_history[-30:]
+            if self.detection_region_scale > 0.3:
+                self.detection_region_scale = max(0.3, self.detection_region_scale - 0.1)
+                print(f"📉 性能优化: 检测区域调整为 {self.detection_region_scale*100:.0f}%")
+            
+        elif avg_fps > self.target_min_fps * 1.5:
+            # 性能充足，可以提升质量
+            if self.adaptive_skip_interval > 1:
+                self.adaptive_skip_interval -= 1
+                print(f"📈 质量提升: 跳帧间隔调整为 {self.adaptive_skip_interval}")
+            
+            if self.detection_region_scale < 0.8:
+                self.detection_region_scale = min(0.8, self.detection_region_scale + 0.1)
+                print(f"📈 质量提升: 检测区域调整为 {self.detection_region_scale*100:.0f}%")
     
-    def get_detection_region(self, frame):
+    def get_detection_rect(self, h, w):
         """
-        获取检测区域（中心区域，减少计算量）
-        支持自定义区域设置
+        计算检测区域在帧中的位置 (x, y, width, height)
+        支持自定义区域设置；结果按帧尺寸和区域参数缓存，参数不变时直接复用
         """
-        h, w = frame.shape[:2]
+        key = (h, w, self.detection_region_scale, self.detection_region_custom_enabled,
+               self.detection_region_custom_x, self.detection_region_custom_y,
+               self.detection_region_custom_width, self.detection_region_custom_height)
+        if key == self._roi_key:
+            return self._roi_rect
         
         if self.detection_region_custom_enabled:
             # 使用自定义区域
@@ -472,76 +742,134 @@ class OptimizedQRCodeScanner:
             y = max(0, min(y, h - 10))
             width = min(width, w - x)
             height = min(height, h - y)
-            
-            # 裁剪区域
-            region = frame[y:y + height, x:x + width]
-            return region, (x, y)
         else:
             # 计算中心区域
-            center_w = int(w * self.detection_region_scale)
-            center_h = int(h * self.detection_region_scale)
+            width = int(w * self.detection_region_scale)
+            height = int(h * self.detection_region_scale)
             
             # 计算起始位置
-            start_x = (w - center_w) // 2
-            start_y = (h - center_h) // 2
-            
-            # 裁剪区域
-            region = frame[start_y:start_y + center_h, start_x:start_x + center_w]
-            
-            return region, (start_x, start_y)
+            x = (w - width) // 2
+            y = (h - height) // 2
+        
+        if self.detection_region_custom_enabled:
+            self._roi_label = (f"Custom Region ({width}x{height})", (0, 0, 255))
+        else:
+            self._roi_label = (f"Detection Region ({self.detection_region_scale*100:.0f}%)", (255, 0, 0))
+        
+        self._roi_key = key
+        self._roi_rect = (x, y, width, height)
+        return self._roi_rect
     
-    def get_scaled_region(self, frame, scale=1.0):
+    def get_detection_region(self, frame):
         """
-        获取缩放后的检测区域
+        获取检测区域（中心区域，减少计算量）
+        返回的是原帧的切片视图（不复制像素），后续cvtColor会生成连续的新数组
         """
-        if scale == 1.0:
-            return self.get_detection_region(frame)
-        
         h, w = frame.shape[:2]
-        new_h, new_w = int(h * scale), int(w * scale)
+        x, y, width, height = self.get_detection_rect(h, w)
+        
+        # 裁剪区域
+        region = frame[y:y + height, x:x + width]
+        return region, (x, y)
+    
+    def get_buffer(self, name, shape):
+        """
+        获取可复用的uint8缓冲区，尺寸变化（分辨率或检测区域调整）时重新分配
+        只在检测线程使用，内容会被下一帧覆盖
+        """
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[name] = buf
+        return buf
+    
+    def to_gray(self, region):
+        """
+        检测区域转灰度图，结果写入复用的缓冲区
+        开启OpenCL时在GPU上转换，只把单通道结果下载回内存
+        """
+        if self.use_opencl:
+            return cv2.cvtColor(cv2.UMat(region), cv2.COLOR_BGR2GRAY).get()
+        dst = self.get_buffer('gray', region.shape[:2])
+        return cv2.cvtColor(region, cv2.COLOR_BGR2GRAY, dst=dst)
+    
+    def get_scale_order(self):
+        """
+        多尺度检测的尝试顺序：上次成功的尺度优先
+        定期按配置顺序完整扫描一次，以适应二维码大小的变化
+        """
+        self.detection_attempts += 1
+        order = list(range(len(self.detection_scales)))
+        if self.detection_attempts % self.full_scale_scan_interval == 0:
+            return order
+        
+        if 0 < self.current_scale_index < len(order):
+            order.insert(0, order.pop(self.current_scale_index))
+        return order
+    
+    def has_qr_like_edges(self, gray):
+        """
+        快速判断区域内是否可能有二维码
+        在1/4分辨率上做Canny边缘检测，边缘像素过少（空白画面）时跳过所有解码器
+        阈值是边缘像素的绝对数量：最小可识别的二维码（约40像素宽）缩小后只剩约10像素，
+        仅外轮廓就有约40个边缘像素；按区域面积的比例计算会在区域放大时误跳过小二维码
+        """
+        if self.edge_gate_min_pixels <= 0:
+            return True
         
-        # 缩放图像
-        scaled_frame = cv2.resize(frame, (new_w, new_h))
+        small = cv2.pyrDown(cv2.pyrDown(gray))
+        edges = cv2.Canny(small, 80, 160)
+        return cv2.countNonZero(edges) >= self.edge_gate_min_pixels
+    
+    def scale_region(self, region, scale=1.0, reuse_buffer=False):
+        """
+        缩放已裁剪的检测区域
+        只对区域内的像素重采样，不再缩放整帧
+        reuse_buffer为True时结果写入该尺度复用的缓冲区（仅限检测线程）
+        """
+        if scale == 1.0:
+            return region
         
-        # 获取检测区域
-        region, offset = self.get_detection_region(scaled_frame)
+        h, w = region.shape[:2]
+        new_h, new_w = max(1, int(h * scale)), max(1, int(w * scale))
         
-        # 调整偏移量
-        adjusted_offset = (int(offset[0] / scale), int(offset[1] / scale))
+        # 缩小时用区域平均插值，模块边缘比双线性更清晰
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
         
-        return region, adjusted_offset, scale
+        if reuse_buffer:
+            dst = self.get_buffer(f'scale_{scale}', (new_h, new_w) + region.shape[2:])
+            return cv2.resize(region, (new_w, new_h), dst=dst, interpolation=interpolation)
+        return cv2.resize(region, (new_w, new_h), interpolation=interpolation)
     
-    def detect_qr_opencv(self, frame):
+    def detect_qr_opencv(self, frame, undecoded=None):
         """
         使用OpenCV的QR检测器（通常比pyzbar更快）
+        一次调用检测并解码画面中的所有二维码
+        undecoded不为None时，定位到但未能解码的二维码角点会追加到该列表
         """
         detected_qrs = []
         try:
             # OpenCV QR检测
-            data, bbox, rectified_image = self.cv_qr_detector.detectAndDecode(frame)
+            ok, decoded_info, bboxes, _ = self.cv_qr_detector.detectAndDecodeMulti(frame)
             
-            if data:
-                # 转换边界框格式
-                if bbox is not None and len(bbox) > 0:
-                    points = bbox[0].astype(int)
+            if ok and bboxes is not None:
+                for data, bbox in zip(decoded_info, bboxes):
+                    # 检测到但未能解码的二维码返回空字符串
+                    if not data:
+                        if undecoded is not None:
+                            undecoded.append(bbox)
+                        continue
+                    
+                    # 转换边界框格式
+                    points = bbox.astype(np.int32)
                     
-                    # 计算矩形边界
-                    x = int(np.min(points[:, 0]))
-                    y = int(np.min(points[:, 1]))
-                    w = int(np.max(points[:, 0]) - x)
-                    h = int(np.max(points[:, 1]) - y)
+                    # 计算矩形边界（按列一次求出最小/最大坐标）
+                    x, y = points.min(axis=0).tolist()
+                    max_x, max_y = points.max(axis=0).tolist()
                     
-                    # 模拟pyzbar的矩形格式
-                    rect = type('Rect', (), {
-                        'left': x, 'top': y, 'width': w, 'height': h
-                    })()
+                    rect = Rect(x, y, max_x - x, max_y - y)
                     
-                    detected_qrs.append({
-                        'data': data,
-                        'rect': rect,
-                        'polygon': [(int(p[0]), int(p[1])) for p in points],
-                        'method': 'opencv'
-                    })
+                    detected_qrs.append(Detection(data, rect, points, 'opencv'))
         except Exception as e:
             pass
         
@@ -553,204 +881,461 @@ class OptimizedQRCodeScanner:
         """
         detected_qrs = []
         try:
-            import os
-            from contextlib import redirect_stderr
-            from io import StringIO
-            
-            f = StringIO()
-            with redirect_stderr(f):
-                detected_codes = pyzbar.decode(frame, symbols=[pyzbar.ZBarSymbol.QRCODE])
+            detected_codes = pyzbar.decode(frame, symbols=[pyzbar.ZBarSymbol.QRCODE])
             
             for qr_code in detected_codes:
                 qr_data = qr_code.data.decode('utf-8')
-                detected_qrs.append({
-                    'data': qr_data,
-                    'rect': qr_code.rect,
-                    'polygon': [(p[0], p[1]) for p in qr_code.polygon],
-                    'method': 'pyzbar'
-                })
+                detected_qrs.append(Detection(qr_data, qr_code.rect, qr_code.polygon, 'pyzbar'))
         except Exception as e:
             pass
         
         return detected_qrs
     
-    def preprocess_frame_optimized(self, frame):
+    def preprocess_frame_optimized(self, gray, method):
         """
         优化的预处理方法 - 只使用最有效的几种
+        输入为检测区域的灰度图（每帧只转换一次，各尺度共用）
+        按需只计算一种预处理结果，pyzbar识别成功后其余结果不再计算
+        method: 0=原灰度图 1=自适应阈值 2=Otsu阈值（仅标准版）
         """
-        processed_frames = []
+        if method == 0:
+            return gray
         
-        if self.use_simple_preprocess:
-            # 简化版：只使用最必要的预处理
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            processed_frames.append(gray)
-            
+        if method == 1:
             # 自适应阈值（最有效的一种）
-            adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                           cv2.THRESH_BINARY, 21, 10)
-            processed_frames.append(adaptive)
-        else:
-            # 标准版：包含更多预处理方法
-            processed_frames.append(frame)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            processed_frames.append(gray)
-            
-            # 自适应阈值
-            adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                           cv2.THRESH_BINARY, 21, 10)
-            processed_frames.append(adaptive)
-            
-            # Otsu阈值
-            _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            processed_frames.append(otsu)
+            return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                                       cv2.THRESH_BINARY, 21, 10)
         
-        return processed_frames
+        # Otsu阈值
+        _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return otsu
+    
+    def get_preprocess_method_count(self):
+        """
+        当前模式下可用的预处理方法数量
+        简化版：灰度图 + 自适应阈值；标准版：再加Otsu阈值
+        """
+        return 2 if self.use_simple_preprocess else 3
+    
+    def to_frame_coords(self, qr, offset, scale):
+        """
+        将检测区域（缩放后）内的矩形和多边形坐标换算回原始帧坐标
+        多边形用NumPy整体换算，返回int32数组
+        """
+        offset_x, offset_y = offset
+        inv_scale = 1.0 / scale
+        rect = qr.rect
+        adjusted_rect = Rect(int(rect.left * inv_scale) + offset_x,
+                             int(rect.top * inv_scale) + offset_y,
+                             int(rect.width * inv_scale),
+                             int(rect.height * inv_scale))
+        
+        polygon = np.array(qr.polygon, dtype=np.float32)
+        if scale != 1.0:
+            polygon *= inv_scale
+        polygon = polygon.astype(np.int32) + np.array([offset_x, offset_y], dtype=np.int32)
+        
+        return adjusted_rect, polygon
     
-    def detect_qr_in_region(self, processed_frames, offset=(0, 0), scale=1.0):
+    def detect_qr_in_region(self, gray, offset=(0, 0), scale=1.0, use_pyzbar=True, undecoded=None):
         """
         在指定区域检测QR码（支持多种检测方法）
+        阈值预处理只在OpenCV未检测到时才计算
+        use_pyzbar为False时只使用OpenCV检测器（pyzbar由后台线程处理）
+        undecoded不为None时，收集定位到但未能解码的二维码角点（换算为缩放前的区域坐标）
         """
         detected_qr_codes = []
-        offset_x, offset_y = offset
         
         # 1. 优先使用OpenCV检测器（如果启用）
-        if self.use_opencv_qr and len(processed_frames) > 0:
-            opencv_results = self.detect_qr_opencv(processed_frames[0])
+        if self.use_opencv_qr:
+            located = [] if undecoded is not None else None
+            opencv_results = self.detect_qr_opencv(gray, located)
+            if located:
+                undecoded.extend(bbox / scale for bbox in located)
             for qr in opencv_results:
                 # 调整坐标
-                adjusted_rect = type('Rect', (), {
-                    'left': int(qr['rect'].left / scale) + offset_x,
-                    'top': int(qr['rect'].top / scale) + offset_y,
-                    'width': int(qr['rect'].width / scale),
-                    'height': int(qr['rect'].height / scale)
-                })()
+                adjusted_rect, polygon = self.to_frame_coords(qr, offset, scale)
                 
-                detected_qr_codes.append({
-                    'data': qr['data'],
-                    'rect': adjusted_rect,
-                    'polygon': [(int(p[0]/scale) + offset_x, int(p[1]/scale) + offset_y) for p in qr['polygon']],
-                    'method': 'opencv'
-                })
+                detected_qr_codes.append(Detection(qr.data, adjusted_rect, polygon, 'opencv'))
         
         # 2. 如果OpenCV没有检测到，使用pyzbar作为备用
-        if not detected_qr_codes:
-            for i, processed_frame in enumerate(processed_frames):
-                pyzbar_results = self.detect_qr_pyzbar(processed_frame)
-                for qr in pyzbar_results:
-                    # 检查是否已经存在
-                    if not any(existing['data'] == qr['data'] for existing in detected_qr_codes):
-                        # 调整坐标
-                        adjusted_rect = type('Rect', (), {
-                            'left': int(qr['rect'].left / scale) + offset_x,
-                            'top': int(qr['rect'].top / scale) + offset_y,
-                            'width': int(qr['rect'].width / scale),
-                            'height': int(qr['rect'].height / scale)
-                        })()
-                        
-                        detected_qr_codes.append({
-                            'data': qr['data'],
-                            'rect': adjusted_rect,
-                            'polygon': [(int(p[0]/scale) + offset_x, int(p[1]/scale) + offset_y) for p in qr['polygon']],
-                            'method': f'pyzbar_{i}'
-                        })
+        if not detected_qr_codes and use_pyzbar:
+            detected_qr_codes = self.detect_qr_pyzbar_in_region(gray, offset, scale)
+
+        return detected_qr_codes
+    
+    def decode_located_regions(self, gray, offset, polygons, use_pyzbar=True):
+        """
+        在原尺寸灰度区域上，只裁剪定位到的二维码附近的小块重新解码
+        小尺度上能定位但模块太小无法解码时，避免再对整个区域做大尺度检测
+        """
+        detected_qr_codes = []
+        h, w = gray.shape[:2]
+        
+        for polygon in polygons:
+            min_x, min_y = polygon.min(axis=0)
+            max_x, max_y = polygon.max(axis=0)
+            
+            # 四周留出静区，避免裁掉定位图案
+            pad = 0.25 * max(max_x - min_x, max_y - min_y)
+            x0, y0 = max(0, int(min_x - pad)), max(0, int(min_y - pad))
+            x1, y1 = min(w, int(max_x + pad) + 1), min(h, int(max_y + pad) + 1)
+            if x1 - x0 < 21 or y1 - y0 < 21:  # 小于最小的二维码（21x21模块）
+                continue
+            
+            patch = gray[y0:y1, x0:x1]
+            detected_qr_codes.extend(
+                self.detect_qr_in_region(patch, (offset[0] + x0, offset[1] + y0), 1.0, use_pyzbar))
         
         return detected_qr_codes
     
-    def check_detection_cache(self, frame_hash):
+    def detect_qr_pyzbar_in_region(self, gray, offset=(0, 0), scale=1.0):
+        """
+        对区域做阈值预处理后用pyzbar检测
+        """
+        detected_qr_codes = []
+        
+        # 优先尝试上次成功的预处理方法，识别成功后不再计算其余预处理结果
+        order = list(range(self.get_preprocess_method_count()))
+        if self.last_pyzbar_method < len(order):
+            order.insert(0, order.pop(self.last_pyzbar_method))
+
+        seen_data = set()
+        for i in order:
+            processed = self.preprocess_frame_optimized(gray, i)
+            pyzbar_results = self.detect_qr_pyzbar(processed)
+            for qr in pyzbar_results:
+                # 检查是否已经存在
+                if qr.data not in seen_data:
+                    seen_data.add(qr.data)
+                    # 调整坐标
+                    adjusted_rect, polygon = self.to_frame_coords(qr, offset, scale)
+                    
+                    detected_qr_codes.append(Detection(qr.data, adjusted_rect, polygon, f'pyzbar_{i}'))
+
+            if detected_qr_codes:
+                self.last_pyzbar_method = i
+                break
+
+        return detected_qr_codes
+    
+    def _decode_loop(self):
+        """
+        pyzbar解码线程：对OpenCV未命中的检测区域逐个尺度尝试pyzbar
+        结果连同缩略图放入结果队列，由主线程写入缓存
+        """
+        while not self._decode_stop.is_set():
+            try:
+                job = self._decode_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            gray_region, offset, thumb = job
+            results = []
+            try:
+                for scale in self.detection_scales:
+                    detection_region = self.scale_region(gray_region, scale)
+                    results = self.detect_qr_pyzbar_in_region(detection_region, offset, scale)
+                    if results:
+                        break
+            except Exception as e:
+                # 单个区域解码出错不能让解码线程退出，按未识别处理
+                results = []
+                if self.debug_mode:
+                    print(f"后台解码错误: {e}")
+            
+            self._result_q.put((thumb, results))
+    
+    def start_decoder(self):
+        """启动pyzbar解码线程"""
+        if not self.async_pyzbar or self._decode_thread is not None:
+            return
+        self._decode_stop.clear()
+        self._decode_thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._decode_thread.start()
+    
+    def stop_decoder(self):
+        """停止pyzbar解码线程"""
+        self._decode_stop.set()
+        if self._decode_thread is not None:
+            self._decode_thread.join(timeout=1.0)
+            self._decode_thread = None
+    
+    def submit_pyzbar_job(self, gray_region, offset, thumb):
+        """
+        提交后台解码任务，队列满时丢弃最旧的任务
+        gray_region会被后台线程读取，不能传入检测线程复用的缓冲区
+        """
+        job = (gray_region, offset, thumb)
+        try:
+            self._decode_q.put_nowait(job)
+        except queue.Full:
+            try:
+                self._decode_q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._decode_q.put_nowait(job)
+            except queue.Full:
+                pass
+    
+    def poll_pyzbar_results(self):
+        """
+        取回后台解码结果（非阻塞），识别到的结果写入缓存
+        返回最近一次非空结果，没有则返回None
+        """
+        latest = None
+        while True:
+            try:
+                thumb, results = self._result_q.get_nowait()
+            except queue.Empty:
+                break
+            if results:
+                self.cache_detection_result(thumb, results)
+                latest = results
+        return latest
+    
+    def get_region_thumbnail(self, region):
+        """
+        生成检测区域的32x32灰度缩略图，用于缓存比较
+        """
+        thumb = cv2.resize(region, (32, 32), interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return thumb
+    
+    def get_thumbnail_key(self, thumb):
+        """
+        计算缩略图的64位差值哈希（dHash），作为内存缓存的键
+        缩小到9x8后比较相邻像素的明暗关系，手持抖动产生的细微变化不会改变哈希；
+        同一位置的不同二维码也会得到相同的哈希，命中的非空结果必须复核
+        """
+        small = cv2.resize(thumb, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return int(np.packbits(bits).view(np.uint64)[0])
+    
+    def verify_cached_result(self, region, offset, result):
+        """
+        复核缓存的识别结果：只在缓存的二维码位置附近裁剪解码
+        内容与缓存一致时返回本帧的识别结果，否则返回None（需要完整检测）
+        缩略图相近不代表二维码相同（同一位置换成另一张二维码时缩略图几乎一样）
+        """
+        gray = self.to_gray(region)
+        origin = np.array(offset, dtype=np.int32)
+        polygons = [qr.polygon - origin for qr in result]
+        fresh = self.decode_located_regions(gray, offset, polygons, self.use_pyzbar_fallback)
+        if set(qr.data for qr in fresh) != set(qr.data for qr in result):
+            return None
+        return fresh
+    
+    def check_detection_cache(self, thumb, region, offset):
         """
         检查检测缓存
+        先按缩略图的差值哈希匹配，再与上次检测的缩略图做模糊比较（容忍传感器噪声）
+        哈希或模糊匹配到的非空结果都要在原位置重新解码确认后才复用
         """
         current_frame = self.frame_count
+        frame_hash = self.get_thumbnail_key(thumb)
         
-        # 清理过期缓存
-        expired_keys = []
-        for key, (cached_frame, result) in self.detection_cache.items():
-            if current_frame - cached_frame > self.cache_ttl:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.detection_cache[key]
+        # 清理过期缓存：只检查最久未使用的一端，遇到未过期的条目即停止
+        while self.detection_cache:
+            oldest_frame, _ = next(iter(self.detection_cache.values()))
+            if current_frame - oldest_frame <= self.cache_ttl:
+                break
+            self.detection_cache.popitem(last=False)
         
         # 检查当前帧
-        if frame_hash in self.detection_cache:
-            cached_frame, result = self.detection_cache[frame_hash]
+        entry = self.detection_cache.get(frame_hash)
+        if entry is not None:
+            cached_frame, result = entry
             if current_frame - cached_frame <= self.cache_ttl:
-                return result
+                # 差值哈希分不清不同的二维码，只有空结果可以直接复用
+                if not result:
+                    self.detection_cache.move_to_end(frame_hash)
+                    return result
+                verified = self.verify_cached_result(region, offset, result)
+                if verified is not None:
+                    self.detection_cache.move_to_end(frame_hash)
+                    return verified
+                # 已换成别的二维码：丢弃该条目，不再做模糊比较（模糊比较同样会复核失败）
+                del self.detection_cache[frame_hash]
+                return None
+            del self.detection_cache[frame_hash]
+        
+        # 画面与上次检测时基本一致，复用上次结果
+        if (self._last_thumb is not None and
+                current_frame - self._last_thumb_frame <= self.cache_ttl):
+            diff = cv2.mean(cv2.absdiff(thumb, self._last_thumb))[0]
+            if diff < self.cache_diff_threshold:
+                if not self._last_thumb_result:
+                    return self._last_thumb_result
+                return self.verify_cached_result(region, offset, self._last_thumb_result)
         
         return None
     
-    def cache_detection_result(self, frame_hash, result):
+    def cache_detection_result(self, thumb, result):
         """
         缓存检测结果
         """
-        self.detection_cache[frame_hash] = (self.frame_count, result)
+        key = self.get_thumbnail_key(thumb)
+        self.detection_cache[key] = (self.frame_count, result)
+        self.detection_cache.move_to_end(key)
+        if len(self.detection_cache) > self.cache_max_size:
+            self.detection_cache.popitem(last=False)
+        
+        self._last_thumb = thumb
+        self._last_thumb_frame = self.frame_count
+        self._last_thumb_result = result
+    
+    def resolve_udp_address(self):
+        """
+        预先解析UDP目标地址，避免每次发送时重新解析主机名
+        """
+        try:
+            return socket.getaddrinfo(self.udp_host, self.udp_port,
+                                      socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+        except socket.gaierror as e:
+            print(f"⚠️  无法解析UDP目标地址 {self.udp_host}: {e}")
+            return (self.udp_host, self.udp_port)
     
     def send_udp_packet(self, qr_data):
-        """发送UDP包"""
+        """
+        发送UDP包
+        发送线程运行时只负责编码并放入发送队列，不在检测线程中等待socket
+        """
         try:
-            packet_data = {
-                'timestamp': datetime.now().isoformat(),
-                'qr_content': qr_data,
-                'source': 'optimized_qr_scanner_v2'
-            }
-            
-            json_data = json.dumps(packet_data, ensure_ascii=False)
+            # 按模板拼接JSON，只有二维码内容需要转义；输出与json.dumps整个字典一致
+            json_data = self.UDP_PACKET_TEMPLATE % (
+                datetime.now().isoformat(), json.dumps(qr_data, ensure_ascii=False))
             encoded_data = json_data.encode('utf-8')
-            
-            self.socket.sendto(encoded_data, (self.udp_host, self.udp_port))
+        except Exception as e:
+            print(f"✗ UDP发送失败: {e}")
+            return
+        
+        if self._sender_thread is None:
+            self._send_encoded(encoded_data, qr_data)
+            return
+        
+        # 队列满时丢弃，实时扫描优先保证低延迟
+        try:
+            self._send_q.put_nowait((encoded_data, qr_data))
+        except queue.Full:
+            print(f"✗ UDP发送队列已满，丢弃: {qr_data}")
+    
+    def _send_encoded(self, encoded_data, qr_data):
+        """通过socket发送已编码的UDP包"""
+        try:
+            self.socket.sendto(encoded_data, self.udp_address)
             print(f"✓ UDP包已发送: {qr_data}")
-            
         except Exception as e:
             print(f"✗ UDP发送失败: {e}")
     
+    def _sender_loop(self):
+        """发送线程：依次发送队列中的UDP包，收到None时退出"""
+        while True:
+            item = self._send_q.get()
+            if item is None:
+                break
+            self._send_encoded(*item)
+    
+    def start_sender(self):
+        """启动UDP发送线程"""
+        self._sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self._sender_thread.start()
+    
+    def stop_sender(self):
+        """发送完队列中剩余的包后停止发送线程"""
+        if self._sender_thread is None:
+            return
+        
+        try:
+            self._send_q.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+        self._sender_thread.join(timeout=1.0)
+        self._sender_thread = None
+    
     def process_frame(self, frame):
         """
         处理单帧图像（高级优化版本）
         """
         self.frame_count += 1
         
-        # 跳帧优化：自适应跳帧间隔
-        if self.frame_skip_count < self.adaptive_skip_interval:
+        # 执行按键触发的状态修改（在检测线程中执行，不会与检测过程交错）
+        while True:
+            try:
+                action = self._pending_actions.get_nowait()
+            except queue.Empty:
+                break
+            action()
+        
+        # 跳帧优化：自适应跳帧间隔（空闲时额外跳帧）
+        if self.frame_skip_count < self.adaptive_skip_interval + self._idle_skip:
             self.frame_skip_count += 1
             return frame
         
         self.frame_skip_count = 0
         
-        # 计算帧哈希用于缓存
-        frame_hash = hash(frame.tobytes()[::1000])  # 简化哈希，只采样部分数据
+        # 取回后台pyzbar的解码结果（晚一两帧到达）
+        deferred_result = self.poll_pyzbar_results() if self._decode_thread is not None else None
+        
+        # 用检测区域的缩略图作为缓存依据，区域外的变化不影响检测结果
+        region, offset = self.get_detection_region(frame)
+        thumb = self.get_region_thumbnail(region)
         
         # 检查缓存
-        cached_result = self.check_detection_cache(frame_hash)
+        cached_result = self.check_detection_cache(thumb, region, offset)
         if cached_result is not None:
             detected_qr_codes = cached_result
         else:
-            # 多尺度检测
+            # 多尺度检测：检测区域只裁剪一次，各尺度都在区域上缩放
+            # QR检测只需要亮度，先转成灰度图，后续缩放和预处理都在单通道上进行
             detected_qr_codes = []
+            gray_region = self.to_gray(region)
+            use_async = self._decode_thread is not None
+            has_edges = self.has_qr_like_edges(gray_region)
             
-            for scale in self.detection_scales:
-                if scale == 1.0:
-                    detection_region, offset = self.get_detection_region(frame)
-                    scale_factor = 1.0
-                else:
-                    detection_region, offset, scale_factor = self.get_scaled_region(frame, scale)
+            use_pyzbar = self.use_pyzbar_fallback and not use_async
+            for scale_index in (self.get_scale_order() if has_edges else ()):
+                scale = self.detection_scales[scale_index]
+                detection_region = self.scale_region(gray_region, scale, reuse_buffer=True)
                 
-                # 预处理
-                processed_frames = self.preprocess_frame_optimized(detection_region)
+                # QR检测（预处理在OpenCV未命中时按需进行）
+                undecoded = []
+                scale_results = self.detect_qr_in_region(detection_region, offset, scale,
+                                                         use_pyzbar=use_pyzbar, undecoded=undecoded)
                 
-                # QR检测
-                scale_results = self.detect_qr_in_region(processed_frames, offset, scale_factor)
+                # 缩小后能定位但无法解码：在原尺寸上只裁剪二维码附近解码，不再对整个区域尝试更大尺度
+                if not scale_results and undecoded and scale < 1.0:
+                    scale_results = self.decode_located_regions(gray_region, offset, undecoded, use_pyzbar)
                 
                 # 如果找到了QR码，就停止继续尝试其他尺度
                 if scale_results:
                     detected_qr_codes.extend(scale_results)
+                    self.current_scale_index = scale_index
                     break
             
+            # OpenCV未命中时交给后台pyzbar，本帧先使用之前取回的结果
+            if not detected_qr_codes and use_async and has_edges and self.use_pyzbar_fallback:
+                # 灰度缓冲区下一帧会被覆盖，交给后台线程前先复制
+                self.submit_pyzbar_job(gray_region.copy(), offset, thumb)
+                if deferred_result:
+                    detected_qr_codes = deferred_result
+            
             # 缓存结果
-            self.cache_detection_result(frame_hash, detected_qr_codes)
+            self.cache_detection_result(thumb, detected_qr_codes)
+        
+        # 空闲降频：连续未识别时逐步降低检测频率，识别到后恢复全速
+        if detected_qr_codes:
+            self._miss_streak = 0
+            self._idle_skip = 0
+        else:
+            self._miss_streak += 1
+            self._idle_skip = min(self.idle_skip_max, self._miss_streak // self.idle_miss_threshold)
         
         # 更新置信度
         current_time = time.time()
-        current_qr_data = set(qr['data'] for qr in detected_qr_codes)
+        current_qr_data = set(qr.data for qr in detected_qr_codes)
         
         # 翻页检测变量
         page_changed = False
@@ -779,10 +1364,7 @@ class OptimizedQRCodeScanner:
                         del self.qr_last_seen_time[qr_data]
         
         for qr_data in current_qr_data:
-            if qr_data in self.qr_confidence:
-                self.qr_confidence[qr_data] += 1
-            else:
-                self.qr_confidence[qr_data] = 1
+            self.qr_confidence[qr_data] = self.qr_confidence.get(qr_data, 0) + 1
                 
             # 翻页检测：记录二维码出现时间
             if self.page_turning_mode:
@@ -806,16 +1388,17 @@ class OptimizedQRCodeScanner:
                         new_stable_qr = qr_data
                     self.last_stable_qr = qr_data
         
-        # 减少未检测到的二维码的信心度
-        for qr_data in list(self.qr_confidence.keys()):
-            if qr_data not in current_qr_data:
-                self.qr_confidence[qr_data] = max(0, self.qr_confidence[qr_data] - 1)
-                if self.qr_confidence[qr_data] == 0:
-                    del self.qr_confidence[qr_data]
+        # 减少未检测到的二维码的信心度（置信度始终>=1，减到0即删除）
+        for qr_data in self.qr_confidence.keys() - current_qr_data:
+            confidence = self.qr_confidence[qr_data] - 1
+            if confidence:
+                self.qr_confidence[qr_data] = confidence
+            else:
+                del self.qr_confidence[qr_data]
         
         # 处理检测到的二维码
         for qr_info in detected_qr_codes:
-            qr_data = qr_info['data']
+            qr_data = qr_info.data
             
             confidence = self.qr_confidence.get(qr_data, 0)
             
@@ -856,19 +1439,16 @@ class OptimizedQRCodeScanner:
                 self.send_udp_packet(qr_data)
                 self.last_qr_data = qr_data
                 self.last_send_time = current_time
-                print(f"✓ Detection success (confidence: {confidence}, method: {qr_info.get('method', 'unknown')})")
+                print(f"✓ Detection success (confidence: {confidence}, method: {qr_info.method})")
                 # 重置页面变化标志
                 if self.page_turning_mode:
                     page_changed = False
                     new_stable_qr = None
             
             # 绘制边框
-            points = qr_info['polygon']
+            points = qr_info.polygon
             if len(points) > 4:
-                hull = cv2.convexHull(np.array([point for point in points], dtype=np.float32))
-                points = hull
-            
-            points = np.array(points, dtype=np.int32)
+                points = cv2.convexHull(points)
             
             # 根据信心度和检测方法改变颜色
             if self.page_turning_mode:
@@ -887,8 +1467,8 @@ class OptimizedQRCodeScanner:
             cv2.polylines(frame, [points], True, color, 2)
             
             # 添加文本（包含检测方法）
-            rect = qr_info['rect']
-            method = qr_info.get('method', 'unknown')
+            rect = qr_info.rect
+            method = qr_info.method
             if self.page_turning_mode:
                 time_visible = current_time - self.qr_first_seen_time.get(qr_data, current_time)
                 status = ""
@@ -909,35 +1489,13 @@ class OptimizedQRCodeScanner:
         # 绘制检测区域边框
         if self.debug_mode:
             h, w = frame.shape[:2]
+            x, y, width, height = self.get_detection_rect(h, w)
             
-            if self.detection_region_custom_enabled:
-                # 绘制自定义检测区域
-                x = self.detection_region_custom_x
-                y = self.detection_region_custom_y
-                width = self.detection_region_custom_width if self.detection_region_custom_width > 0 else w
-                height = self.detection_region_custom_height if self.detection_region_custom_height > 0 else h
-                
-                # 确保区域在图像范围内
-                x = max(0, min(x, w - 10))
-                y = max(0, min(y, h - 10))
-                width = min(width, w - x)
-                height = min(height, h - y)
-                
-                cv2.rectangle(frame, (x, y), (x + width, y + height), (0, 0, 255), 2)
-                cv2.putText(frame, f"Custom Region ({width}x{height})", 
-                           (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-            else:
-                # 绘制中心检测区域
-                center_w = int(w * self.detection_region_scale)
-                center_h = int(h * self.detection_region_scale)
-                start_x = (w - center_w) // 2
-                start_y = (h - center_h) // 2
-                
-                cv2.rectangle(frame, (start_x, start_y), 
-                             (start_x + center_w, start_y + center_h), 
-                             (255, 0, 0), 2)
-                cv2.putText(frame, f"Detection Region ({self.detection_region_scale*100:.0f}%)", 
-                           (start_x, start_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+            # 区域位置、标签和颜色都来自缓存，只在区域变化时重新生成
+            # （自定义区域为红色，中心区域为蓝色）
+            label, color = self._roi_label
+            cv2.rectangle(frame, (x, y), (x + width, y + height), color, 2)
+            cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
             
             # 在翻页模式下显示状态信息
             if self.page_turning_mode:
@@ -982,15 +1540,21 @@ class OptimizedQRCodeScanner:
         
         print(f"🔄 切换摄像头: {getattr(self, 'current_camera_index', 0)} -> {new_camera_index}")
         
+        # 切换期间暂停采集线程，避免读取正在释放的摄像头
+        capturing = self._capture_thread is not None
+        self.stop_capture()
+        
         # 释放当前摄像头
         self.cap.release()
         
         # 打开新摄像头
-        self.cap = cv2.VideoCapture(new_camera_index)
+        self.cap = self.open_camera(new_camera_index)
         if not self.cap.isOpened():
             print(f"❌ 无法打开摄像头 {new_camera_index}")
             # 回退到原摄像头
-            self.cap = cv2.VideoCapture(getattr(self, 'current_camera_index', 0))
+            self.cap = self.open_camera(getattr(self, 'current_camera_index', 0))
+            if capturing:
+                self.start_capture()
             return
         
         # 更新当前摄像头索引
@@ -1000,6 +1564,9 @@ class OptimizedQRCodeScanner:
         self.detect_camera_capabilities()
         self.optimize_camera_settings()
         
+        if capturing:
+            self.start_capture()
+        
         # 更新配置
         self.config_manager.set('default_camera_index', new_camera_index)
         
@@ -1037,6 +1604,8 @@ class OptimizedQRCodeScanner:
         # 更新性能配置
         perf_config = {
             'adaptive_skip_interval': self.adaptive_skip_interval,
+            'idle_miss_threshold': self.idle_miss_threshold,
+            'idle_skip_max': self.idle_skip_max,
             'detection_region_scale': self.detection_region_scale,
             'detection_region_custom': {
                 'enabled': self.detection_region_custom_enabled,
@@ -1047,16 +1616,25 @@ class OptimizedQRCodeScanner:
             },
             'use_simple_preprocess': self.use_simple_preprocess,
             'use_opencv_qr': self.use_opencv_qr,
+            'use_aruco_qr_detector': self.use_aruco_qr_detector,
+            'use_pyzbar_fallback': self.use_pyzbar_fallback,
+            'async_pyzbar': self.async_pyzbar,
+            'use_opencl': self.use_opencl_config,
+            'opencv_threads': self.opencv_threads,
+            'edge_gate_min_pixels': self.edge_gate_min_pixels,
             'dynamic_resolution': self.dynamic_resolution,
             'detection_scales': self.detection_scales,
             'min_confidence': self.min_confidence,
-            'cache_ttl': self.cache_ttl
+            'cache_ttl': self.cache_ttl,
+            'cache_diff_threshold': self.cache_diff_threshold,
+            'cache_max_size': self.cache_max_size
         }
         
         self.config_manager.set('performance', perf_config)
         self.config_manager.set('send_interval', self.send_interval)
         self.config_manager.set('debug_mode', self.debug_mode)
         self.config_manager.set('show_ui', self.show_ui)
+        self.config_manager.set('use_opengl_window', self.use_opengl_window)
         self.config_manager.set('page_turning_mode', self.page_turning_mode)
         self.config_manager.set('page_stable_time', self.page_stable_time)
         self.config_manager.set('send_only_on_page_change', self.send_only_on_page_change)
@@ -1068,122 +1646,321 @@ class OptimizedQRCodeScanner:
         self.config_manager.save_config()
         print("✓ 当前配置已保存")
 
+    def _capture_loop(self):
+        """
+        采集线程：持续读取摄像头，队列中只保留最新一帧
+        读取失败时放入None通知主循环
+        """
+        while not self._stop.is_set():
+            frame = None
+            if self.cap.grab():
+                # 写入池中的空闲缓冲区；尺寸不符时OpenCV会自动分配新数组
+                ret, frame = self.cap.retrieve(self.acquire_frame_buffer())
+                if not ret:
+                    frame = None
+            
+            # 丢弃还未被处理的旧帧，缓冲区放回池中
+            try:
+                self.release_frame_buffer(self._frame_q.get_nowait())
+            except queue.Empty:
+                pass
+            self._frame_q.put(frame)
+            
+            if frame is None:
+                break
+    
+    def acquire_frame_buffer(self):
+        """从缓冲区池取一个空闲帧缓冲区，池为空时返回None（由OpenCV分配）"""
+        try:
+            return self._free_frames.get_nowait()
+        except queue.Empty:
+            return None
+    
+    def release_frame_buffer(self, frame):
+        """
+        帧不再使用后放回缓冲区池
+        调用后不能再访问该帧，它会被采集线程覆盖
+        """
+        if frame is not None:
+            self._free_frames.put(frame)
+    
+    def start_capture(self):
+        """启动采集线程"""
+        self._stop.clear()
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._capture_thread.start()
+    
+    def stop_capture(self):
+        """停止采集线程并清空帧队列"""
+        self._stop.set()
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=1.0)
+            self._capture_thread = None
+        
+        try:
+            self.release_frame_buffer(self._frame_q.get_nowait())
+        except queue.Empty:
+            pass
+    
+    def _detect_loop(self):
+        """
+        检测线程：从采集队列取帧，处理后放入显示队列
+        显示跟不上时阻塞等待（最多积压2帧）；采集结束的None同样转发给主循环
+        """
+        while not self._detect_stop.is_set():
+            try:
+                frame = self._frame_q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            if frame is not None:
+                try:
+                    frame = self.process_frame(frame)
+                except Exception as e:
+                    # 单帧处理出错时记录错误，照常显示未标注的原始帧
+                    # （None表示采集结束，不能用来表示处理失败）
+                    print(f"帧处理错误: {e}")
+            
+            while not self._detect_stop.is_set():
+                try:
+                    self._draw_q.put(frame, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            
+            if frame is None:
+                break
+    
+    def start_detection(self):
+        """启动检测线程"""
+        self._detect_stop.clear()
+        self._detect_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        self._detect_thread.start()
+    
+    def stop_detection(self):
+        """停止检测线程并清空显示队列"""
+        self._detect_stop.set()
+        if self._detect_thread is not None:
+            self._detect_thread.join(timeout=1.0)
+            self._detect_thread = None
+        
+        while True:
+            try:
+                self._draw_q.get_nowait()
+            except queue.Empty:
+                break
+    
+    def build_key_actions(self):
+        """
+        构建按键到操作的映射（'q'退出由主循环处理）
+        修改检测状态的操作交给检测线程执行；窗口、摄像头切换和信息显示在主线程执行
+        """
+        deferred = self.run_on_detection_thread
+        return {
+            ord('d'): deferred(self.toggle_debug_mode),
+            ord('s'): deferred(self.toggle_simple_preprocess),
+            ord('o'): deferred(self.toggle_opencv_qr),
+            ord('a'): deferred(self.toggle_dynamic_resolution),
+            ord('r'): deferred(self.cycle_detection_region_scale),
+            ord('t'): deferred(self.toggle_custom_detection_region),
+            ord('c'): deferred(self.clear_detection_cache),
+            ord('i'): self.show_camera_info,
+            ord('h'): self.show_performance_tips,
+            ord('w'): self.toggle_camera_warning,
+            ord('n'): lambda: self.switch_camera('next'),
+            ord('p'): lambda: self.switch_camera('prev'),
+            ord('l'): self.list_cameras,
+            ord('z'): self.save_current_config,
+            ord('x'): self.rescan_cameras,
+            ord('u'): self.toggle_ui,
+            ord('b'): deferred(self.toggle_page_turning_mode),
+            ord('v'): deferred(self.cycle_page_stable_time),
+            ord('m'): deferred(self.toggle_send_only_on_page_change),
+        }
+    
+    def run_on_detection_thread(self, action):
+        """
+        返回一个把action交给检测线程执行的函数
+        检测线程在处理下一帧之前执行，不会在process_frame中途修改检测状态
+        """
+        return lambda: self._pending_actions.put(action)
+    
+    def toggle_debug_mode(self):
+        """切换调试模式（调试模式下显示zbar的原始输出）"""
+        self.debug_mode = not self.debug_mode
+        if self.debug_mode:
+            self.restore_native_stderr()
+        else:
+            self.suppress_native_stderr()
+        print(f"调试模式: {'开启' if self.debug_mode else '关闭'}")
+    
+    def toggle_simple_preprocess(self):
+        """切换简化预处理"""
+        self.use_simple_preprocess = not self.use_simple_preprocess
+        print(f"简化预处理: {'开启' if self.use_simple_preprocess else '关闭'}")
+    
+    def toggle_opencv_qr(self):
+        """切换OpenCV检测器"""
+        self.use_opencv_qr = not self.use_opencv_qr
+        print(f"OpenCV检测器: {'开启' if self.use_opencv_qr else '关闭'}")
+    
+    def toggle_dynamic_resolution(self):
+        """切换自适应优化"""
+        self.dynamic_resolution = not self.dynamic_resolution
+        print(f"自适应优化: {'开启' if self.dynamic_resolution else '关闭'}")
+    
+    def cycle_detection_region_scale(self):
+        """调整检测区域"""
+        if self.detection_region_scale == 0.5:
+            self.detection_region_scale = 0.7
+        elif self.detection_region_scale == 0.7:
+            self.detection_region_scale = 1.0
+        else:
+            self.detection_region_scale = 0.5
+        print(f"检测区域: {self.detection_region_scale*100:.0f}%")
+    
+    def toggle_custom_detection_region(self):
+        """切换自定义检测区域"""
+        self.detection_region_custom_enabled = not self.detection_region_custom_enabled
+        print(f"自定义检测区域: {'启用' if self.detection_region_custom_enabled else '禁用'}")
+        if self.detection_region_custom_enabled:
+            print(f"  位置: ({self.detection_region_custom_x}, {self.detection_region_custom_y}), "
+                  f"大小: {self.detection_region_custom_width}x{self.detection_region_custom_height}")
+    
+    def clear_detection_cache(self):
+        """清除缓存"""
+        self.detection_cache.clear()
+        self._last_thumb = None
+        print("缓存已清除")
+    
+    def toggle_camera_warning(self):
+        """切换警告显示"""
+        self.show_camera_warning = not self.show_camera_warning
+        print(f"摄像头警告: {'显示' if self.show_camera_warning else '隐藏'}")
+    
+    def rescan_cameras(self):
+        """重新检测摄像头"""
+        self.config_manager.detect_available_cameras()
+        self.config_manager.save_config()
+        print("摄像头检测完成并保存到配置文件")
+    
+    def toggle_ui(self):
+        """切换UI显示"""
+        self.show_ui = not self.show_ui
+        print(f"界面显示: {'开启' if self.show_ui else '关闭'}")
+        if not self.show_ui:
+            self.close_display_window()
+            print("界面已关闭，程序继续在后台运行")
+            print("按Ctrl+C中断程序")
+    
+    def toggle_page_turning_mode(self):
+        """切换翻页模式"""
+        self.page_turning_mode = not self.page_turning_mode
+        print(f"Page Turn Mode: {'Enabled' if self.page_turning_mode else 'Disabled'}")
+        if self.page_turning_mode:
+            print("  - In page turning mode, UDP packets will only be sent after QR code is stable")
+            print(f"  - Stability threshold: {self.page_stable_time} seconds")
+            # 重置翻页检测状态
+            self.last_stable_qr = None
+            self.qr_first_seen_time = {}
+            self.qr_last_seen_time = {}
+            self.page_turning_in_progress = False
+    
+    def cycle_page_stable_time(self):
+        """调整稳定时间阈值"""
+        if self.page_stable_time == 0.5:
+            self.page_stable_time = 1.0
+        elif self.page_stable_time == 1.0:
+            self.page_stable_time = 2.0
+        else:
+            self.page_stable_time = 0.5
+        print(f"Page Stability Threshold: {self.page_stable_time} seconds")
+    
+    def toggle_send_only_on_page_change(self):
+        """切换是否只在页面变化时发送UDP包"""
+        self.send_only_on_page_change = not self.send_only_on_page_change
+        print(f"Send Only On Page Change: {'Enabled' if self.send_only_on_page_change else 'Disabled'}")
+        if self.send_only_on_page_change:
+            print("  - UDP packets will only be sent when page changes")
+        else:
+            print("  - UDP packets will be sent periodically based on send_interval")
+    
+    def create_display_window(self):
+        """
+        创建显示窗口
+        启用OpenGL时图像通过纹理上传由驱动绘制，省去CPU端的软件绘制；
+        OpenCV未编译OpenGL支持时回退为普通窗口
+        """
+        if self.use_opengl_window:
+            try:
+                cv2.namedWindow(self.WINDOW_NAME, cv2.WINDOW_OPENGL | cv2.WINDOW_AUTOSIZE)
+                self._window_created = True
+                print("🖥️ 使用OpenGL窗口显示")
+                return
+            except cv2.error:
+                self.use_opengl_window = False
+                print("⚠️ 当前OpenCV不支持OpenGL窗口，使用普通窗口")
+        cv2.namedWindow(self.WINDOW_NAME, cv2.WINDOW_AUTOSIZE)
+        self._window_created = True
+    
+    def close_display_window(self):
+        """
+        关闭显示窗口（只关闭本程序创建的窗口）
+        关闭界面后不再调用waitKey处理窗口事件，隐藏的窗口会变成无响应状态，因此直接销毁
+        """
+        if self._window_created:
+            cv2.destroyWindow(self.WINDOW_NAME)
+            cv2.waitKey(1)  # 处理销毁事件，部分后端需要事件循环才会真正关闭窗口
+            self._window_created = False
+    
     def run(self):
         """运行扫描器"""
-        fps_counter = 0
-        fps_start_time = time.time()
-        last_fps_time = time.time()
+        fps_counter = 0  # 本统计周期内的帧数
+        fps_samples = 0  # 已完成的统计周期数
+        last_fps_time = time.monotonic()
         
         try:
+            # 屏蔽zbar的C层警告输出（只在开始扫描时重定向一次，避免每次解码都切换）
+            # 摄像头此时已打开并配置好，调试模式下保留原始输出，便于查看zbar的诊断信息
+            if not self.debug_mode:
+                self.suppress_native_stderr()
+            
+            self.start_capture()
+            self.start_decoder()
+            self.start_sender()
+            self.start_detection()
+            
             while True:
-                ret, frame = self.cap.read()
-                if not ret:
+                # 取出检测线程处理好的帧
+                try:
+                    frame = self._draw_q.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                
+                if frame is None:
                     print("无法读取摄像头数据")
                     break
                 
-                # 处理帧
-                frame = self.process_frame(frame)
-                
                 # 根据配置决定是否显示界面
                 if self.show_ui:
                     # 显示
-                    cv2.imshow('Optimized QR Scanner V2', frame)
+                    if not self._window_created:
+                        self.create_display_window()
+                    cv2.imshow(self.WINDOW_NAME, frame)
                     
                     # 按键处理
                     key = cv2.waitKey(1) & 0xFF
                     if key == ord('q'):
                         break
-                    elif key == ord('d'):
-                        self.debug_mode = not self.debug_mode
-                        print(f"调试模式: {'开启' if self.debug_mode else '关闭'}")
-                    elif key == ord('s'):  # 切换简化预处理
-                        self.use_simple_preprocess = not self.use_simple_preprocess
-                        print(f"简化预处理: {'开启' if self.use_simple_preprocess else '关闭'}")
-                    elif key == ord('o'):  # 切换OpenCV检测器
-                        self.use_opencv_qr = not self.use_opencv_qr
-                        print(f"OpenCV检测器: {'开启' if self.use_opencv_qr else '关闭'}")
-                    elif key == ord('a'):  # 切换自适应优化
-                        self.dynamic_resolution = not self.dynamic_resolution
-                        print(f"自适应优化: {'开启' if self.dynamic_resolution else '关闭'}")
-                    elif key == ord('r'):  # 调整检测区域
-                        if self.detection_region_scale == 0.5:
-                            self.detection_region_scale = 0.7
-                        elif self.detection_region_scale == 0.7:
-                            self.detection_region_scale = 1.0
-                        else:
-                            self.detection_region_scale = 0.5
-                        print(f"检测区域: {self.detection_region_scale*100:.0f}%")
-                    elif key == ord('t'):  # 切换自定义检测区域
-                        self.detection_region_custom_enabled = not self.detection_region_custom_enabled
-                        print(f"自定义检测区域: {'启用' if self.detection_region_custom_enabled else '禁用'}")
-                        if self.detection_region_custom_enabled:
-                            print(f"  位置: ({self.detection_region_custom_x}, {self.detection_region_custom_y}), "
-                                  f"大小: {self.detection_region_custom_width}x{self.detection_region_custom_height}")
-                    elif key == ord('c'):  # 清除缓存
-                        self.detection_cache.clear()
-                        print("缓存已清除")
-                    elif key == ord('i'):  # 显示摄像头信息
-                        self.show_camera_info()
-                    elif key == ord('h'):  # 显示性能提示
-                        self.show_performance_tips()
-                    elif key == ord('w'):  # 切换警告显示
-                        self.show_camera_warning = not self.show_camera_warning
-                        print(f"摄像头警告: {'显示' if self.show_camera_warning else '隐藏'}")
-                    elif key == ord('n'):  # 切换到下一个摄像头
-                        self.switch_camera('next')
-                    elif key == ord('p'):  # 切换到上一个摄像头
-                        self.switch_camera('prev')
-                    elif key == ord('l'):  # 列出可用摄像头
-                        self.list_cameras()
-                    elif key == ord('z'):  # 保存当前配置
-                        self.save_current_config()
-                    elif key == ord('x'):  # 重新检测摄像头
-                        self.config_manager.detect_available_cameras()
-                        self.config_manager.save_config()
-                        print("摄像头检测完成并保存到配置文件")
-                    elif key == ord('u'):  # 切换UI显示
-                        self.show_ui = not self.show_ui
-                        print(f"界面显示: {'开启' if self.show_ui else '关闭'}")
-                        if not self.show_ui:
-                            cv2.destroyAllWindows()
-                            print("界面已关闭，程序继续在后台运行")
-                            print("按Ctrl+C中断程序")
-                    elif key == ord('b'):  # 切换翻页模式
-                        self.page_turning_mode = not self.page_turning_mode
-                        print(f"Page Turn Mode: {'Enabled' if self.page_turning_mode else 'Disabled'}")
-                        if self.page_turning_mode:
-                            print("  - In page turning mode, UDP packets will only be sent after QR code is stable")
-                            print(f"  - Stability threshold: {self.page_stable_time} seconds")
-                            # 重置翻页检测状态
-                            self.last_stable_qr = None
-                            self.qr_first_seen_time = {}
-                            self.qr_last_seen_time = {}
-                            self.page_turning_in_progress = False
-                    elif key == ord('v'):  # 调整稳定时间阈值
-                        if self.page_stable_time == 0.5:
-                            self.page_stable_time = 1.0
-                        elif self.page_stable_time == 1.0:
-                            self.page_stable_time = 2.0
-                        else:
-                            self.page_stable_time = 0.5
-                        print(f"Page Stability Threshold: {self.page_stable_time} seconds")
-                    elif key == ord('m'):  # 切换是否只在页面变化时发送UDP包
-                        self.send_only_on_page_change = not self.send_only_on_page_change
-                        print(f"Send Only On Page Change: {'Enabled' if self.send_only_on_page_change else 'Disabled'}")
-                        if self.send_only_on_page_change:
-                            print("  - UDP packets will only be sent when page changes")
-                        else:
-                            print("  - UDP packets will be sent periodically based on send_interval")
+                    action = self.key_actions.get(key)
+                    if action is not None:
+                        action()
                 else:
                     # 无界面模式下，增加短暂延时避免CPU占用过高
                     time.sleep(0.001)
                     
                     # 检查是否有中断信号
                     try:
-                        import select
-                        import sys
-                        import os
-                        
                         # 检测操作系统类型
                         if os.name == 'nt':  # Windows系统
                             import msvcrt
@@ -1202,21 +1979,28 @@ class OptimizedQRCodeScanner:
                         if self.debug_mode:
                             print(f"检查输入错误 (忽略): {e}")
                 
+                # 显示完成（imshow已复制图像），帧缓冲区交还采集线程复用
+                self.release_frame_buffer(frame)
+                
                 # FPS计算和性能监控
+                # 使用单调时钟，系统时间调整不会影响帧率统计
                 fps_counter += 1
-                current_time = time.time()
+                current_time = time.monotonic()
                 
                 if current_time - last_fps_time >= 1.0:  # 每秒计算一次FPS
-                    current_fps = fps_counter / (current_time - fps_start_time) * fps_counter / fps_counter
-                    self.fps_history.append(current_fps)
+                    # 只统计最近一个周期的帧率，而不是启动以来的平均值
+                    current_fps = fps_counter / (current_time - last_fps_time)
+                    self.record_fps(current_fps)
+                    fps_samples += 1
                     
-                    if fps_counter % 30 == 0:
+                    if fps_samples % 30 == 0:
                         print(f"当前FPS: {current_fps:.1f}, 缓存命中: {len(self.detection_cache)}")
                     
-                    # 自适应性能调整
-                    if self.dynamic_resolution and fps_counter % self.performance_check_interval == 0:
+                    # 自适应性能调整（历史记录足够时才会实际调整）
+                    if self.dynamic_resolution:
                         self.adaptive_performance_adjust(current_fps)
                     
+                    fps_counter = 0
                     last_fps_time = current_time
                     
         except KeyboardInterrupt:
@@ -1229,10 +2013,14 @@ class OptimizedQRCodeScanner:
     def cleanup(self):
         """清理资源"""
         print("正在清理资源...")
+        self.stop_capture()
+        self.stop_detection()
+        self.stop_decoder()
+        self.stop_sender()
         self.cap.release()
-        if self.show_ui:
-            cv2.destroyAllWindows()
+        self.close_display_window()
         self.socket.close()
+        self.restore_native_stderr()
         print("资源清理完成")
 
     def set_custom_detection_region(self, x, y, width, height, enabled=True):
@@ -1298,6 +2086,8 @@ def main():
     print("\n命令行参数:")
     print("  --debug                  启用调试模式")
     print("  --no-ui                  禁用界面显示")
+    print("  --gl                     使用OpenGL窗口显示")
+    print("  --no-gl                  使用普通窗口显示")
     print("  --page-turning           启用翻页检测模式")
     print("  --no-page-turning        禁用翻页检测模式")
     print("  --stable-time=秒数       设置页面稳定时间阈值")
@@ -1307,6 +2097,8 @@ def main():
     print("  --fps=帧率               设置目标帧率")
     print("  --config=文件路径        指定配置文件路径")
     print("  --camera=索引            指定摄像头索引")
+    print("  --backend=后端           指定采集后端（auto/any/v4l2/dshow/msmf/avfoundation）")
+    print("  --rescan-cameras         重新检测可用摄像头（忽略已保存的列表）")
     
     # 解析参数
     resolution = None
@@ -1315,10 +2107,13 @@ def main():
     target_fps = None
     config_file = "camera_config.json"
     show_ui = None
+    use_opengl_window = None
+    camera_backend = None
     detection_region = None
     page_turning_mode = None
     page_stable_time = None
     page_turning_send_mode = None
+    rescan_cameras = False
     
     args = sys.argv[1:]
     i = 0
@@ -1329,6 +2124,15 @@ def main():
         elif args[i] == '--no-ui':
             show_ui = False
             args.pop(i)
+        elif args[i] == '--gl':
+            use_opengl_window = True
+            args.pop(i)
+        elif args[i] == '--no-gl':
+            use_opengl_window = False
+            args.pop(i)
+        elif args[i] == '--rescan-cameras':
+            rescan_cameras = True
+            args.pop(i)
         elif args[i] == '--page-turning':
             page_turning_mode = True
             args.pop(i)
@@ -1374,6 +2178,12 @@ def main():
             except ValueError:
                 print(f"警告：无效的目标帧率")
                 i += 1
+        elif args[i].startswith('--backend='):
+            camera_backend = args[i].replace('--backend=', '').lower()
+            if camera_backend != 'auto' and camera_backend not in CAPTURE_BACKENDS:
+                print(f"警告：未知的采集后端 {camera_backend}，使用auto")
+                camera_backend = 'auto'
+            args.pop(i)
         elif args[i].startswith('--config='):
             config_file = args[i].replace('--config=', '')
             args.pop(i)
@@ -1408,34 +2218,47 @@ def main():
         # 如果命令行指定了检测区域，更新配置
         if detection_region:
             config_manager.set('performance.detection_region_custom', detection_region)
-            config_manager.save_config()
             print(f"✓ 已更新检测区域设置: x={detection_region['x']}, y={detection_region['y']}, "
                   f"width={detection_region['width']}, height={detection_region['height']}")
         
         # 如果命令行指定了UI显示设置，更新配置
         if show_ui is not None:
             config_manager.set('show_ui', show_ui)
-            config_manager.save_config()
             print(f"✓ 已更新UI显示设置: {'显示' if show_ui else '不显示'}")
         
+        # 如果命令行指定了OpenGL窗口设置，更新配置
+        if use_opengl_window is not None:
+            config_manager.set('use_opengl_window', use_opengl_window)
+            print(f"✓ 已更新OpenGL窗口设置: {'开启' if use_opengl_window else '关闭'}")
+        
         # 如果命令行指定了翻页模式，更新配置
         if page_turning_mode is not None:
             config_manager.set('page_turning_mode', page_turning_mode)
-            config_manager.save_config()
             print(f"✓ 已更新翻页模式: {'开启' if page_turning_mode else '关闭'}")
         
         # 如果命令行指定了稳定时间阈值，更新配置
         if page_stable_time is not None:
             config_manager.set('page_stable_time', page_stable_time)
-            config_manager.save_config()
             print(f"✓ 已更新页面稳定时间阈值: {page_stable_time}秒")
             
         # 如果命令行指定了页面变化发送模式，更新配置
         if page_turning_send_mode is not None:
             config_manager.set('send_only_on_page_change', page_turning_send_mode)
-            config_manager.save_config()
             print(f"✓ 已更新页面变化发送模式: {'只在页面变化时发送' if page_turning_send_mode else '定期发送'}")
         
+        # 如果命令行指定了采集后端，更新配置
+        if camera_backend is not None:
+            config_manager.set('camera_backend', camera_backend)
+            print(f"✓ 已更新采集后端: {camera_backend}")
+        
+        # 如果命令行要求重新检测摄像头，使已保存的列表失效
+        if rescan_cameras:
+            config_manager.set('available_cameras_time', 0)
+            print("✓ 启动时将重新检测摄像头")
+        
+        # 命令行参数的修改一次性写入配置文件（没有修改时不会写盘）
+        config_manager.save_config()
+        
         scanner = OptimizedQRCodeScanner(
             udp_host=UDP_HOST, 
             udp_port=UDP_PORT, 